@@ -15,6 +15,10 @@ Usage:
   # Use sensor id 1 as reference
   DATABASE_URL=postgresql://... python3 calibrate.py --method reference --ref-id 1 --minutes 10
 
+Windows of 10 minutes or more are read from the sensor_readings_1m/1h/1d
+continuous aggregates (coarsest that still gives 10 buckets); pass --raw to
+always read individual readings.
+
 Environment:
   DATABASE_URL: PostgreSQL connection string (required)
 """
@@ -27,26 +31,86 @@ from datetime import datetime, timedelta
 import statistics
 
 
-def fetch_recent_readings(conn, minutes=10):
-    """Fetch recent sensor readings (raw values) grouped by sensor_id."""
+# Continuous aggregates maintained by temp_monitor, coarsest first: (view, bucket minutes)
+AGGREGATES = [
+    ("sensor_readings_1d", 1440),
+    ("sensor_readings_1h", 60),
+    ("sensor_readings_1m", 1),
+]
+
+# Minimum number of buckets per sensor for an aggregate to be used for a window
+MIN_BUCKETS = 10
+
+
+def choose_source(conn, minutes):
+    """Pick the coarsest aggregate giving at least MIN_BUCKETS buckets over the window.
+
+    Returns None (use raw readings) for short windows or when no aggregates exist.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT view_name FROM timescaledb_information.continuous_aggregates "
+            "WHERE view_name = ANY(%s)",
+            ([view for view, _ in AGGREGATES],)
+        )
+        available = {row[0] for row in cursor.fetchall()}
+    except psycopg2.Error:
+        conn.rollback()
+        available = set()
+    finally:
+        cursor.close()
+    for view, width in AGGREGATES:
+        if width * MIN_BUCKETS <= minutes and view in available:
+            return view
+    return None
+
+
+def fetch_recent_readings(conn, minutes=10, use_aggregates=True):
+    """Fetch recent sensor readings grouped by sensor_id as [(time, raw, count)].
+
+    For longer windows each sample is a bucket of a continuous aggregate: its
+    mean raw value and the number of readings behind it. Adaptive polling and
+    the deadband filter make bucket counts uneven, so means must be weighted by
+    `count`; raw readings have a count of 1.
+    """
     cursor = conn.cursor()
     since = datetime.utcnow() - timedelta(minutes=minutes)
-    cursor.execute("""
-        SELECT sensor_id, time, raw_value
-        FROM sensor_readings
-        WHERE time >= %s
-        ORDER BY time ASC
-    """, (since,))
+    source = choose_source(conn, minutes) if use_aggregates else None
+    if source is None:
+        cursor.execute("""
+            SELECT sensor_id, time, raw_value, 1
+            FROM sensor_readings
+            WHERE time >= %s
+            ORDER BY time ASC
+        """, (since,))
+    else:
+        cursor.execute(f"""
+            SELECT sensor_id, bucket, avg_raw, reading_count
+            FROM {source}
+            WHERE bucket >= %s
+            ORDER BY bucket ASC
+        """, (since,))
     rows = cursor.fetchall()
     cursor.close()
     
     # Group by sensor_id
     data = {}
-    for sensor_id, ts, raw in rows:
-        data.setdefault(sensor_id, []).append((ts, raw))
+    for sensor_id, ts, raw, count in rows:
+        data.setdefault(sensor_id, []).append((ts, raw, count))
     return data
 
 
+def reading_count(samples):
+    """Number of readings behind `samples`."""
+    return sum(count for _, _, count in samples)
+
+
+def mean_raw(samples):
+    """Mean raw value of `samples`, weighting each by its reading count."""
+    return sum(raw * count for _, raw, count in samples) / reading_count(samples)
+
+
 def compute_offsets_median(data):
     """
     Compute offsets using median consensus.
@@ -57,9 +121,8 @@ def compute_offsets_median(data):
     """
     means = {}
     for sid, samples in data.items():
-        raws = [r for _, r in samples]
-        if raws:
-            means[sid] = sum(raws) / len(raws)
+        if samples:
+            means[sid] = mean_raw(samples)
     
     if not means:
         return {}
@@ -81,14 +144,13 @@ def compute_offsets_reference(data, ref_id):
     if ref_id not in data or not data[ref_id]:
         raise ValueError(f"Reference sensor {ref_id} has no recent samples")
     
-    ref_samples = data[ref_id]
-    ref_mean = sum([r for _, r in ref_samples]) / len(ref_samples)
+    ref_mean = mean_raw(data[ref_id])
     
     offsets = {}
     for sid, samples in data.items():
         if not samples:
             continue
-        mean = sum([r for _, r in samples]) / len(samples)
+        mean = mean_raw(samples)
         # Offset in raw units; round to nearest integer
         offsets[sid] = int(round(ref_mean - mean))
     
@@ -128,6 +190,11 @@ def main():
         type=int,
         help="Sensor id to use as reference (required for --method reference)"
     )
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Always read raw readings, never the minute/hour/day rollups"
+    )
     args = parser.parse_args()
 
     database_url = os.getenv("DATABASE_URL")
@@ -142,12 +209,12 @@ def main():
         sys.exit(1)
 
     try:
-        data = fetch_recent_readings(conn, minutes=args.minutes)
+        data = fetch_recent_readings(conn, minutes=args.minutes, use_aggregates=not args.raw)
         if not data:
             print("No recent readings found in the database")
             return
 
-        print(f"Found {sum(len(s) for s in data.values())} readings across {len(data)} sensors in the last {args.minutes} minutes\n")
+        print(f"Found {sum(reading_count(s) for s in data.values())} readings across {len(data)} sensors in the last {args.minutes} minutes\n")
 
         if args.method == "median":
             print("Computing offsets using median consensus method...")
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+chunks.py
+
+Report hypertable chunk sizes and tune chunk_time_interval to the actual ingest rate.
+
+TimescaleDB defaults to 7-day chunks whatever the write rate. The most recent
+chunk of every hypertable (data plus indexes) should fit comfortably in memory
+- TimescaleDB suggests about 25% of RAM - so inserts and recent queries never
+touch disk. This script estimates rows/second and bytes/row from recent data,
+splits that memory budget across the hypertables and recommends an interval.
+
+Usage:
+  # Show chunks, measured ingest rate and the recommended interval
+  DATABASE_URL=postgresql://... python3 chunks.py report
+
+  # Apply the recommendation (affects chunks created from now on)
+  DATABASE_URL=postgresql://... python3 chunks.py tune --apply
+
+Environment:
+  DATABASE_URL (or TIMESCALEDB_URL): PostgreSQL connection string (required)
+"""
+
+import os
+import sys
+import argparse
+import psycopg2
+from datetime import timedelta
+
+
+HYPERTABLES = ("sensor_readings_raw", "trv_temperatures")
+
+# Fraction of RAM the active chunks of all hypertables may occupy
+MEMORY_FRACTION = 0.25
+
+# Candidate intervals, largest first; the recommendation is snapped down to one of these
+CHUNK_INTERVALS = [
+    timedelta(days=28),
+    timedelta(days=14),
+    timedelta(days=7),
+    timedelta(days=3),
+    timedelta(days=1),
+    timedelta(hours=12),
+    timedelta(hours=6),
+    timedelta(hours=1),
+]
+
+
+def total_memory_bytes():
+    """Physical memory of this machine from /proc/meminfo, or None if unknown."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def recommend_chunk_interval(rows_per_second, bytes_per_row, budget_bytes):
+    """Largest candidate interval whose chunk (rows x bytes/row) fits in `budget_bytes`."""
+    if rows_per_second <= 0 or bytes_per_row <= 0:
+        return CHUNK_INTERVALS[0]
+    seconds = budget_bytes / (rows_per_second * bytes_per_row)
+    for interval in CHUNK_INTERVALS:
+        if interval.total_seconds() <= seconds:
+            return interval
+    return CHUNK_INTERVALS[-1]
+
+
+def current_chunk_interval(cursor, table):
+    """Return the hypertable's chunk interval, or None if `table` is not a hypertable."""
+    cursor.execute("""
+        SELECT time_interval FROM timescaledb_information.dimensions
+        WHERE hypertable_name = %s AND dimension_type = 'Time'
+    """, (table,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def fetch_chunks(cursor, table):
+    """Return [(chunk, range_start, range_end, is_compressed, total_bytes, est_rows)] oldest first."""
+    cursor.execute("""
+        SELECT c.chunk_name, c.range_start, c.range_end, c.is_compressed,
+               s.total_bytes, GREATEST(pc.reltuples, 0)::bigint
+        FROM timescaledb_information.chunks c
+        JOIN chunks_detailed_size(%s) s
+          ON s.chunk_schema = c.chunk_schema AND s.chunk_name = c.chunk_name
+        JOIN pg_class pc ON pc.oid = format('%%I.%%I', c.chunk_schema, c.chunk_name)::regclass
+        WHERE c.hypertable_name = %s
+        ORDER BY c.range_start
+    """, (table, table))
+    return cursor.fetchall()
+
+
+def measure_ingest(cursor, table, chunks, window_hours):
+    """Return (rows_per_second, bytes_per_row) from the last `window_hours` and uncompressed chunks."""
+    cursor.execute(
+        f"SELECT count(*) FROM {table} WHERE time > now() - %s * INTERVAL '1 hour'",
+        (window_hours,)
+    )
+    rows_per_second = cursor.fetchone()[0] / (window_hours * 3600)
+
+    # Compressed chunks are much smaller per row, so only uncompressed ones show the in-memory footprint
+    sized = [(total, rows) for _, _, _, compressed, total, rows in chunks if not compressed and rows]
+    total_bytes = sum(total for total, _ in sized)
+    total_rows = sum(rows for _, rows in sized)
+    bytes_per_row = total_bytes / total_rows if total_rows else 0
+    return rows_per_second, bytes_per_row
+
+
+def analyse(conn, memory_bytes, window_hours):
+    """Return [(table, current_interval, chunks, rows/s, bytes/row, recommended)] for each hypertable."""
+    results = []
+    cursor = conn.cursor()
+    try:
+        tables = [t for t in HYPERTABLES if current_chunk_interval(cursor, t) is not None]
+        budget = memory_bytes * MEMORY_FRACTION / max(1, len(tables))
+        for table in tables:
+            current = current_chunk_interval(cursor, table)
+            chunks = fetch_chunks(cursor, table)
+            rows_per_second, bytes_per_row = measure_ingest(cursor, table, chunks, window_hours)
+            recommended = None
+            if bytes_per_row:
+                recommended = recommend_chunk_interval(rows_per_second, bytes_per_row, budget)
+            results.append((table, current, chunks, rows_per_second, bytes_per_row, recommended))
+    finally:
+        cursor.close()
+    return results
+
+
+def print_report(results, memory_bytes):
+    print(f"Memory budget: {MEMORY_FRACTION:.0%} of {memory_bytes / 1048576:.0f} MB "
+          f"shared by {len(results)} hypertable(s)\n")
+    for table, current, chunks, rows_per_second, bytes_per_row, recommended in results:
+        print(f"{table}: chunk interval {current}, {len(chunks)} chunks")
+        for name, start, end, compressed, total, rows in chunks:
+            flag = "compressed" if compressed else ""
+            print(f"  {name:32s} {start:%Y-%m-%d %H:%M} .. {end:%Y-%m-%d %H:%M} "
+                  f"{total / 1048576:8.1f} MB {rows:>10d} rows  {flag}")
+        print(f"  ingest: {rows_per_second:.2f} rows/s, {bytes_per_row:.0f} bytes/row (incl. indexes)")
+        if recommended is None:
+            print("  recommendation: not enough uncompressed data yet\n")
+            continue
+        chunk_bytes = rows_per_second * bytes_per_row * recommended.total_seconds()
+        verdict = "keep" if recommended == current else "change to"
+        print(f"  recommendation: {verdict} {recommended} "
+              f"(~{chunk_bytes / 1048576:.1f} MB per chunk)\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report hypertable chunk sizes and tune chunk_time_interval"
+    )
+    parser.add_argument("command", choices=("report", "tune"), help="report only, or tune intervals")
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="With tune: set the recommended intervals (default is a dry run)"
+    )
+    parser.add_argument(
+        "--memory-mb",
+        type=int,
+        help="RAM available to the database host (default: this machine's MemTotal)"
+    )
+    parser.add_argument(
+        "--window-hours",
+        type=float,
+        default=24,
+        help="How much recent data to measure the ingest rate over"
+    )
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL") or os.getenv("TIMESCALEDB_URL")
+    if not database_url:
+        print("ERROR: DATABASE_URL environment variable not set")
+        sys.exit(1)
+
+    memory_bytes = args.memory_mb * 1048576 if args.memory_mb else total_memory_bytes()
+    if not memory_bytes:
+        print("ERROR: Could not determine memory size; pass --memory-mb")
+        sys.exit(1)
+
+    try:
+        conn = psycopg2.connect(database_url)
+    except Exception as e:
+        print(f"ERROR: Failed to connect to database: {e}")
+        sys.exit(1)
+
+    try:
+        results = analyse(conn, memory_bytes, args.window_hours)
+        if not results:
+            print("No hypertables found (is TimescaleDB installed?)")
+            return
+        print_report(results, memory_bytes)
+
+        if args.command != "tune":
+            return
+        changes = [(table, rec) for table, current, _, _, _, rec in results
+                   if rec is not None and rec != current]
+        if not changes:
+            print("Chunk intervals already match the recommendations.")
+            return
+        if not args.apply:
+            print("Dry run; re-run with --apply to set the recommended intervals.")
+            return
+        cursor = conn.cursor()
+        for table, interval in changes:
+            cursor.execute("SELECT set_chunk_time_interval(%s, %s)", (table, interval))
+            print(f"Set {table} chunk interval to {interval} (applies to new chunks)")
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,17 @@ from datetime import datetime, timedelta
 from typing import Optional, List
 
 
+# Continuous aggregates maintained by temp_monitor, coarsest first: (view, bucket seconds)
+AGGREGATES = [
+    ('sensor_readings_1d', 86400),
+    ('sensor_readings_1h', 3600),
+    ('sensor_readings_1m', 60),
+]
+
+# Target number of points per sensor when no explicit resolution is requested
+MAX_POINTS = 500
+
+
 class SensorDataPlotter:
     def __init__(self, host: str = "localhost", port: int = 5432,
                  database: str = "sensor_data", user: str = "sensor_user",
@@ -21,6 +32,7 @@ class SensorDataPlotter:
         self.user = user
         self.password = password
         self.conn = None
+        self._aggregates = None
     
     def connect(self):
         """Connect to TimescaleDB"""
@@ -49,21 +61,70 @@ class SensorDataPlotter:
             df['time'] = pd.to_datetime(df['time'])
         return df
     
+    def available_aggregates(self) -> List[str]:
+        """Names of the continuous aggregates present in the database"""
+        if self._aggregates is None:
+            names = ', '.join(f"'{view}'" for view, _ in AGGREGATES)
+            df = pd.read_sql_query(
+                f"SELECT view_name FROM timescaledb_information.continuous_aggregates "
+                f"WHERE view_name IN ({names})", self.conn)
+            self._aggregates = set(df['view_name'])
+        return self._aggregates
+    
+    def choose_source(self, resolution_seconds: float) -> Optional[str]:
+        """Pick the coarsest aggregate no wider than the requested resolution.
+        
+        Returns None when only raw readings are fine enough (or no aggregates exist).
+        """
+        try:
+            available = self.available_aggregates()
+        except Exception:
+            # Plain PostgreSQL, or TimescaleDB without the rollups
+            self.conn.rollback()
+            self._aggregates = available = set()
+        for view, width in AGGREGATES:
+            if width <= resolution_seconds and view in available:
+                return view
+        return None
+    
     def get_sensor_data(self, sensor_ids: Optional[List[int]] = None,
-                       hours: int = 24) -> pd.DataFrame:
-        """Get recent sensor data for specified sensors"""
+                       hours: int = 24,
+                       resolution: Optional[float] = None) -> pd.DataFrame:
+        """Get recent sensor data for specified sensors
+        
+        `resolution` is the desired spacing between points in seconds; by default
+        it is chosen to give about MAX_POINTS points per sensor. Pass 0 to force
+        raw readings. When a rollup is used, each row is one bucket and carries
+        its average temperature and raw value.
+        """
         where_clause = ""
         if sensor_ids:
             sensor_list = ','.join(map(str, sensor_ids))
             where_clause = f"AND sensor_id IN ({sensor_list})"
         
-        query = f"""
-            SELECT time, sensor_id, temperature_celsius, temperature_fahrenheit, raw_value
-            FROM sensor_readings
-            WHERE time > NOW() - INTERVAL '{hours} hours'
-            {where_clause}
-            ORDER BY time, sensor_id
-        """
+        if resolution is None:
+            resolution = hours * 3600 / MAX_POINTS
+        source = self.choose_source(resolution)
+        
+        if source is None:
+            query = f"""
+                SELECT time, sensor_id, temperature_celsius, temperature_fahrenheit, raw_value
+                FROM sensor_readings
+                WHERE time > NOW() - INTERVAL '{hours} hours'
+                {where_clause}
+                ORDER BY time, sensor_id
+            """
+        else:
+            query = f"""
+                SELECT bucket AS time, sensor_id,
+                       avg_celsius AS temperature_celsius,
+                       avg_celsius * 9.0 / 5.0 + 32 AS temperature_fahrenheit,
+                       avg_raw AS raw_value
+                FROM {source}
+                WHERE bucket > NOW() - INTERVAL '{hours} hours'
+                {where_clause}
+                ORDER BY bucket, sensor_id
+            """
         return self.query_to_dataframe(query)
     
     def plot_temperature_time_series(self, sensor_ids: Optional[List[int]] = None,
@@ -95,17 +156,32 @@ class SensorDataPlotter:
     
     def plot_sensor_comparison(self, hours: int = 24):
         """Plot average temperature by sensor"""
-        query = f"""
-            SELECT sensor_id, 
-                   AVG(temperature_celsius) as avg_temp_c,
-                   MIN(temperature_celsius) as min_temp_c,
-                   MAX(temperature_celsius) as max_temp_c,
-                   COUNT(*) as reading_count
-            FROM sensor_readings
-            WHERE time > NOW() - INTERVAL '{hours} hours'
-            GROUP BY sensor_id
-            ORDER BY sensor_id
-        """
+        # Whole-window statistics; any rollup with at least ~24 buckets in the window will do
+        source = self.choose_source(hours * 3600 / 24)
+        if source is not None:
+            query = f"""
+                SELECT sensor_id,
+                       SUM(avg_celsius * reading_count) / SUM(reading_count) as avg_temp_c,
+                       MIN(min_celsius) as min_temp_c,
+                       MAX(max_celsius) as max_temp_c,
+                       SUM(reading_count) as reading_count
+                FROM {source}
+                WHERE bucket > NOW() - INTERVAL '{hours} hours'
+                GROUP BY sensor_id
+                ORDER BY sensor_id
+            """
+        else:
+            query = f"""
+                SELECT sensor_id, 
+                       AVG(temperature_celsius) as avg_temp_c,
+                       MIN(temperature_celsius) as min_temp_c,
+                       MAX(temperature_celsius) as max_temp_c,
+                       COUNT(*) as reading_count
+                FROM sensor_readings
+                WHERE time > NOW() - INTERVAL '{hours} hours'
+                GROUP BY sensor_id
+                ORDER BY sensor_id
+            """
         df = self.query_to_dataframe(query)
         
         fig, ax = plt.subplots(figsize=(12, 6))
@@ -125,7 +201,8 @@ class SensorDataPlotter:
     def plot_raw_values_distribution(self, sensor_ids: Optional[List[int]] = None,
                                     hours: int = 24):
         """Plot distribution of raw sensor values"""
-        df = self.get_sensor_data(sensor_ids, hours)
+        # A histogram of bucket averages would hide the spread, so always use raw readings
+        df = self.get_sensor_data(sensor_ids, hours, resolution=0)
         
         fig, ax = plt.subplots(figsize=(12, 6))
         
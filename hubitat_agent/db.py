@@ -1,14 +1,98 @@
 import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import Json
-from typing import List, Dict, Any
+from psycopg2.extras import Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from typing import List, Dict, Any, Optional
 
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+# Upper bound on concurrent webhook inserts; further requests wait for a free connection
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "4"))
+# Connections idle for longer than this are pinged with SELECT 1 before reuse
+DB_HEALTHCHECK_INTERVAL = int(os.getenv("DB_HEALTHCHECK_INTERVAL", "60"))
 
-def get_conn():
-    dsn = os.getenv("TIMESCALEDB_URL") or os.getenv("DATABASE_URL")
-    if not dsn:
-        raise RuntimeError("TIMESCALEDB_URL or DATABASE_URL must be set")
-    return psycopg2.connect(dsn)
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+_last_used = {}
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            dsn = os.getenv("TIMESCALEDB_URL") or os.getenv("DATABASE_URL")
+            if not dsn:
+                raise RuntimeError("TIMESCALEDB_URL or DATABASE_URL must be set")
+            _pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, dsn)
+            _last_used.clear()
+        return _pool
+
+
+def _is_healthy(conn) -> bool:
+    if conn.closed:
+        return False
+    if conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if time.monotonic() - _last_used.get(id(conn), 0) < DB_HEALTHCHECK_INTERVAL:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        return False
+
+
+def _release(pool, conn, broken: bool):
+    if broken or conn.closed:
+        _last_used.pop(id(conn), None)
+        broken = True
+    else:
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            _last_used[id(conn)] = time.monotonic()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            _last_used.pop(id(conn), None)
+            broken = True
+    try:
+        pool.putconn(conn, close=broken)
+    except Exception:
+        pass
+
+
+@contextmanager
+def pooled_conn():
+    """Borrow a healthy connection from the pool for the duration of a `with` block.
+
+    Connections the server has dropped are discarded and replaced; a connection
+    that raises OperationalError/InterfaceError while borrowed is closed rather
+    than returned. Use ``with conn:`` inside the block to commit.
+    """
+    pool = get_pool()
+    with _pool_slots:
+        for _ in range(DB_POOL_MAX + 1):
+            conn = pool.getconn()
+            if _is_healthy(conn):
+                break
+            _release(pool, conn, broken=True)
+        else:
+            raise psycopg2.OperationalError("No healthy database connection available")
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            _release(pool, conn, broken)
 
 
 def init_database():
@@ -18,12 +102,7 @@ def init_database():
     running external migrations tooling. It will also try to convert the
     table into a TimescaleDB hypertable if the extension is available.
     """
-    dsn = os.getenv("TIMESCALEDB_URL") or os.getenv("DATABASE_URL")
-    if not dsn:
-        raise RuntimeError("TIMESCALEDB_URL or DATABASE_URL must be set to init database")
-
-    conn = psycopg2.connect(dsn)
-    try:
+    with pooled_conn() as conn:
         with conn:
             with conn.cursor() as cur:
                 cur.execute(
@@ -38,7 +117,20 @@ def init_database():
                         battery INTEGER,
                         health_status TEXT,
                         operating_state TEXT,
-                        raw JSONB
+                        raw JSONB,
+                        descriptor_hash BIGINT
+                    );
+                    """
+                )
+                # An existing table may predate migrations/004_trv_device_descriptors.sql
+                cur.execute("ALTER TABLE trv_temperatures ADD COLUMN IF NOT EXISTS descriptor_hash BIGINT;")
+                cur.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS trv_device_descriptors (
+                        hash BIGINT PRIMARY KEY,
+                        device_id TEXT,
+                        descriptor JSONB NOT NULL,
+                        first_seen TIMESTAMPTZ NOT NULL DEFAULT now()
                     );
                     """
                 )
@@ -47,37 +139,213 @@ def init_database():
                     cur.execute("SELECT create_hypertable('trv_temperatures', 'time', if_not_exists => TRUE);")
                 except Exception:
                     pass
-    finally:
-        conn.close()
     return True
 
 
-def insert_trv_rows(rows: List[Dict[str, Any]]):
+# Hashes already present in trv_device_descriptors, so steady-state polls skip the upsert
+_known_descriptors = set()
+
+
+# Maker API device keys that only change when the device is reconfigured. Volatile
+# fields such as `date` (last activity) are left out so the hash stays stable.
+DESCRIPTOR_KEYS = ("id", "name", "label", "type", "room", "model", "manufacturer", "capabilities", "commands")
+
+
+def device_descriptor(device: Dict[str, Any]) -> Dict[str, Any]:
+    """The slowly-changing part of a Maker API device object.
+
+    Attribute values change every poll and are stored as reading columns;
+    the descriptor keeps DESCRIPTOR_KEYS plus the attribute names.
+    """
+    descriptor = {k: device[k] for k in DESCRIPTOR_KEYS if k in device}
+    descriptor["attributes"] = sorted((device.get("attributes") or {}).keys())
+    return descriptor
+
+
+def descriptor_hash(descriptor: Dict[str, Any]) -> int:
+    """Signed 64-bit content hash of a descriptor (first 8 bytes of SHA-256 of canonical JSON)."""
+    canonical = json.dumps(descriptor, sort_keys=True, separators=(",", ":"), default=str)
+    return int.from_bytes(hashlib.sha256(canonical.encode("utf-8")).digest()[:8], "big", signed=True)
+
+
+INSERT_DESCRIPTORS_SQL = (
+    "INSERT INTO trv_device_descriptors (hash, device_id, descriptor) VALUES %s"
+    " ON CONFLICT (hash) DO NOTHING"
+)
+
+INSERT_TRV_SQL = (
+    "INSERT INTO trv_temperatures"
+    " (time, device_id, label, room, temperature, setpoint, battery, health_status, operating_state, descriptor_hash)"
+    " VALUES %s"
+)
+INSERT_TRV_TEMPLATE = "(now(), %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
+
+def insert_trv_rows(rows: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Insert a batch of extracted TRV rows with a single multi-row INSERT.
+
+    Each row's device object is stored once in `trv_device_descriptors` and
+    referenced by hash, rather than written as JSONB with every reading.
+    Returns timing for the batch: ``{"rows": n, "connect_ms": ..., "write_ms": ...}``
+    where ``write_ms`` covers the INSERTs and commit.
+    """
+    timing = {"rows": len(rows), "connect_ms": 0.0, "write_ms": 0.0}
     if not rows:
-        return
-    conn = get_conn()
-    try:
+        return timing
+    values = []
+    new_descriptors = {}
+    for r in rows:
+        ref = None
+        if r.get("raw") is not None:
+            descriptor = device_descriptor(r["raw"])
+            ref = descriptor_hash(descriptor)
+            if ref not in _known_descriptors:
+                new_descriptors[ref] = (ref, r.get("device_id"), Json(descriptor))
+        values.append((
+            r.get("device_id"),
+            r.get("label"),
+            r.get("room"),
+            r.get("temperature"),
+            r.get("setpoint"),
+            r.get("battery"),
+            r.get("health_status"),
+            r.get("operating_state"),
+            ref,
+        ))
+
+    # A connection that died while idle in the pool fails on first use; retry once on a fresh one
+    for attempt in (1, 2):
+        started = time.perf_counter()
+        try:
+            with pooled_conn() as conn:
+                connected = time.perf_counter()
+                with conn:
+                    with conn.cursor() as cur:
+                        if new_descriptors:
+                            execute_values(cur, INSERT_DESCRIPTORS_SQL, list(new_descriptors.values()))
+                        # One statement for the whole batch rather than a round trip per device
+                        execute_values(cur, INSERT_TRV_SQL, values, template=INSERT_TRV_TEMPLATE, page_size=len(values))
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            if attempt == 2:
+                raise
+            continue
+        break
+    _known_descriptors.update(new_descriptors)
+    timing["connect_ms"] = (connected - started) * 1000
+    timing["write_ms"] = (time.perf_counter() - connected) * 1000
+    return timing
+
+
+def fetch_latest_trv_rows(fields: List[str], since_seconds: int) -> Dict[str, Any]:
+    """Return ``{device_id: (time, {field: value})}`` for each device's newest row.
+
+    Only rows from the last `since_seconds` are considered; older devices are
+    due a heartbeat write anyway.
+    """
+    columns = ", ".join(fields)
+    with pooled_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT DISTINCT ON (device_id) device_id, time, {columns}"
+                " FROM trv_temperatures"
+                " WHERE time > now() - %s * INTERVAL '1 second'"
+                " ORDER BY device_id, time DESC",
+                (since_seconds,),
+            )
+            rows = cur.fetchall()
+    return {row[0]: (row[1], dict(zip(fields, row[2:]))) for row in rows}
+
+
+def configure_compression(compress_after: str) -> bool:
+    """Keep the `trv_temperatures` compression policy at `compress_after`.
+
+    Compression itself is enabled by migrations/002_enable_trv_compression.sql;
+    this enables it too if needed (e.g. after the init_database fallback) and
+    replaces the policy when the configured age changes. Returns False if the
+    table is not a hypertable.
+    """
+    with pooled_conn() as conn:
         with conn:
             with conn.cursor() as cur:
-                sql = (
-                    "INSERT INTO trv_temperatures"
-                    " (time, device_id, label, room, temperature, setpoint, battery, health_status, operating_state, raw)"
-                    " VALUES (now(), %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+                cur.execute(
+                    "SELECT compression_enabled FROM timescaledb_information.hypertables"
+                    " WHERE hypertable_name = 'trv_temperatures'"
+                )
+                row = cur.fetchone()
+                if row is None:
+                    return False
+                if not row[0]:
+                    cur.execute(
+                        "ALTER TABLE trv_temperatures SET ("
+                        " timescaledb.compress,"
+                        " timescaledb.compress_segmentby = 'device_id',"
+                        " timescaledb.compress_orderby = 'time DESC')"
+                    )
+                cur.execute(
+                    "SELECT (config->>'compress_after')::interval = %s::interval"
+                    " FROM timescaledb_information.jobs"
+                    " WHERE proc_name = 'policy_compression' AND hypertable_name = 'trv_temperatures'",
+                    (compress_after,),
                 )
-                for r in rows:
+                row = cur.fetchone()
+                if row is not None and not row[0]:
+                    cur.execute("SELECT remove_compression_policy('trv_temperatures')")
+                if row is None or not row[0]:
                     cur.execute(
-                        sql,
-                        (
-                            r.get("device_id"),
-                            r.get("label"),
-                            r.get("room"),
-                            r.get("temperature"),
-                            r.get("setpoint"),
-                            r.get("battery"),
-                            r.get("health_status"),
-                            r.get("operating_state"),
-                            Json(r.get("raw")),
-                        ),
+                        "SELECT add_compression_policy('trv_temperatures', %s::interval)",
+                        (compress_after,),
                     )
-    finally:
-        conn.close()
+    return True
+
+
+def configure_retention(drop_after: Optional[str]) -> bool:
+    """Keep the `trv_temperatures` retention policy at `drop_after`.
+
+    `None` (the default) removes any policy so readings are kept forever;
+    there is no downsampled copy of TRV history to fall back on. Returns
+    False if the table is not a hypertable.
+    """
+    with pooled_conn() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT 1 FROM timescaledb_information.hypertables"
+                    " WHERE hypertable_name = 'trv_temperatures'"
+                )
+                if cur.fetchone() is None:
+                    return False
+                cur.execute(
+                    "SELECT (config->>'drop_after')::interval = %s::interval"
+                    " FROM timescaledb_information.jobs"
+                    " WHERE proc_name = 'policy_retention' AND hypertable_name = 'trv_temperatures'",
+                    (drop_after,),
+                )
+                row = cur.fetchone()
+                if row is not None and (drop_after is None or not row[0]):
+                    cur.execute("SELECT remove_retention_policy('trv_temperatures')")
+                if drop_after is not None and (row is None or not row[0]):
+                    cur.execute(
+                        "SELECT add_retention_policy('trv_temperatures', %s::interval)",
+                        (drop_after,),
+                    )
+    return True
+
+
+def compression_report() -> str:
+    """Return a one-line summary of the compression achieved on `trv_temperatures`."""
+    with pooled_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT total_chunks, number_compressed_chunks,"
+                " before_compression_total_bytes, after_compression_total_bytes"
+                " FROM hypertable_compression_stats('trv_temperatures')"
+            )
+            row = cur.fetchone()
+    if not row or not row[1]:
+        return f"trv_temperatures: {(row[0] if row else 0) or 0} chunks, none compressed yet"
+    total, compressed, before, after = row
+    ratio = before / after if after else 0.0
+    return (
+        f"trv_temperatures: {compressed}/{total} chunks compressed, "
+        f"{before / 1048576:.1f} MB -> {after / 1048576:.1f} MB ({ratio:.1f}x)"
+    )
@@ -1,6 +1,32 @@
 import os
+import re
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from typing import List, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Dict, Any, Optional, Callable, Iterator
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; without it the device list is parsed in one go
+    ijson = None
+
+logger = logging.getLogger("hubitat_client")
+
+# Retries for connection errors and 5xx responses, with exponential backoff between attempts
+HUBITAT_RETRIES = int(os.getenv("HUBITAT_RETRIES", "3"))
+HUBITAT_BACKOFF = float(os.getenv("HUBITAT_BACKOFF", "0.5"))
+HUBITAT_TIMEOUT = float(os.getenv("HUBITAT_TIMEOUT", "10"))
+# Comma-separated device IDs; when set only these are fetched, via the per-device endpoint
+HUBITAT_DEVICE_IDS = [i.strip() for i in os.getenv("HUBITAT_DEVICE_IDS", "").split(",") if i.strip()]
+# Concurrent per-device requests (also the size of the keep-alive connection pool)
+HUBITAT_MAX_WORKERS = int(os.getenv("HUBITAT_MAX_WORKERS", "4"))
+
+_session = None
+_session_lock = threading.Lock()
 
 
 def build_api_url() -> str:
@@ -25,14 +51,177 @@ def build_api_url() -> str:
     return f"http://{host}/apps/api/50/devices/all?access_token={token}"
 
 
-def fetch_devices() -> List[Dict[str, Any]]:
+def build_device_url(device_id: str) -> str:
+    """URL of the Maker API endpoint for a single device, derived from the /devices/all URL."""
     url = build_api_url()
-    resp = requests.get(url, timeout=10)
+    if "/devices/all" not in url:
+        raise RuntimeError("Per-device fetching needs a Maker API URL ending in /devices/all")
+    return url.replace("/devices/all", f"/devices/{device_id}", 1)
+
+
+def get_session() -> requests.Session:
+    """Return the shared HTTP session, so polls reuse a kept-alive connection to the hub."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=HUBITAT_RETRIES,
+                backoff_factor=HUBITAT_BACKOFF,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset(["GET"]),
+            )
+            adapter = HTTPAdapter(max_retries=retry, pool_maxsize=HUBITAT_MAX_WORKERS)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def normalise_device(device: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a per-device response to the /devices/all shape.
+
+    The single-device endpoint lists attributes as
+    ``[{"name": ..., "currentValue": ...}]``; /devices/all gives a
+    ``{name: value}`` dict, which is what extract_trv_fields expects.
+    """
+    attributes = device.get("attributes")
+    if isinstance(attributes, list):
+        device = dict(device)
+        device["attributes"] = {
+            a.get("name"): a.get("currentValue") for a in attributes if isinstance(a, dict)
+        }
+    return device
+
+
+def fetch_device(device_id: str) -> Dict[str, Any]:
+    resp = get_session().get(build_device_url(device_id), timeout=HUBITAT_TIMEOUT)
     resp.raise_for_status()
     data = resp.json()
-    if not isinstance(data, list):
-        raise RuntimeError("Unexpected Hubitat response: expected a list")
-    return data
+    if not isinstance(data, dict):
+        raise RuntimeError(f"Unexpected Hubitat response for device {device_id}: expected an object")
+    return normalise_device(data)
+
+
+def capability_names(device: Dict[str, Any]) -> set:
+    """Capability names of a device (/devices/all mixes names with attribute descriptors)."""
+    return {c for c in device.get("capabilities") or [] if isinstance(c, str)}
+
+
+# Default capabilities marking a device worth recording
+THERMOSTAT_CAPABILITIES = ("Thermostat", "ThermostatMode", "ThermostatSetpoint", "TemperatureMeasurement")
+
+
+def compile_device_filter(
+    capabilities: Optional[List[str]] = None,
+    types: Optional[List[str]] = None,
+    ids: Optional[List[str]] = None,
+) -> Callable[[Dict[str, Any]], bool]:
+    """Build a predicate deciding which devices to record.
+
+    A device passes if its id is in `ids` (when given) and it has any of
+    `capabilities` or a type containing any of `types` (case-insensitive).
+    Devices without capability information (e.g. some webhook payloads) pass
+    the capability check. With neither capabilities nor types every device
+    passes. Everything is precomputed here so the per-device check is cheap.
+    """
+    capabilities = frozenset(capabilities or ())
+    type_pattern = re.compile("|".join(re.escape(t) for t in types), re.IGNORECASE) if types else None
+    ids = frozenset(str(i) for i in ids) if ids else None
+    match_all = not capabilities and type_pattern is None
+
+    def keep(device: Dict[str, Any]) -> bool:
+        if ids is not None and str(device.get("id")) not in ids:
+            return False
+        if match_all:
+            return True
+        if capabilities and ("capabilities" not in device
+                             or not capabilities.isdisjoint(capability_names(device))):
+            return True
+        return bool(type_pattern and type_pattern.search(device.get("type") or ""))
+
+    return keep
+
+
+def device_filter_from_env() -> Callable[[Dict[str, Any]], bool]:
+    """Compile the device filter from HUBITAT_FILTER_CAPABILITIES, HUBITAT_FILTER_TYPES and HUBITAT_DEVICE_IDS."""
+    def split(value):
+        return [v.strip() for v in value.split(",") if v.strip()]
+
+    return compile_device_filter(
+        capabilities=split(os.getenv("HUBITAT_FILTER_CAPABILITIES", ",".join(THERMOSTAT_CAPABILITIES))),
+        types=split(os.getenv("HUBITAT_FILTER_TYPES", "")),
+        ids=HUBITAT_DEVICE_IDS,
+    )
+
+
+# Default filter: anything reporting temperature or acting as a thermostat
+is_thermostat = compile_device_filter(capabilities=THERMOSTAT_CAPABILITIES)
+
+
+def iter_devices(
+    device_ids: Optional[List[str]] = None,
+    keep: Optional[Callable[[Dict[str, Any]], bool]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield devices from the Maker API one at a time, skipping those `keep` rejects.
+
+    With `device_ids` (default: HUBITAT_DEVICE_IDS) only those devices are
+    fetched, in parallel from the per-device endpoint; devices that fail are
+    skipped with a warning. Otherwise /devices/all is streamed and parsed
+    incrementally with ijson when it is installed, so each device is checked
+    and released before the next is read.
+    """
+    if device_ids is None:
+        device_ids = HUBITAT_DEVICE_IDS
+    if device_ids:
+        for device in fetch_devices_by_id(device_ids):
+            if keep is None or keep(device):
+                yield device
+        return
+
+    resp = get_session().get(build_api_url(), timeout=HUBITAT_TIMEOUT, stream=ijson is not None)
+    try:
+        resp.raise_for_status()
+        if ijson is not None:
+            resp.raw.decode_content = True
+            events = ijson.parse(resp.raw, use_float=True)
+            first = next(events, None)
+            if first is None or first[1] != "start_array":
+                raise RuntimeError("Unexpected Hubitat response: expected a list")
+            devices = ijson.items(itertools.chain([first], events), "item")
+        else:
+            devices = resp.json()
+            if not isinstance(devices, list):
+                raise RuntimeError("Unexpected Hubitat response: expected a list")
+        for device in devices:
+            if keep is None or keep(device):
+                yield device
+    finally:
+        # Hand the kept-alive connection back even if the caller stops early
+        resp.close()
+
+
+def fetch_devices(
+    device_ids: Optional[List[str]] = None,
+    keep: Optional[Callable[[Dict[str, Any]], bool]] = None,
+) -> List[Dict[str, Any]]:
+    """Fetch devices from the Maker API as a list (see iter_devices)."""
+    return list(iter_devices(device_ids, keep))
+
+
+def fetch_devices_by_id(device_ids: List[str]) -> List[Dict[str, Any]]:
+    def fetch(device_id):
+        try:
+            return fetch_device(device_id)
+        except Exception as e:
+            logger.warning("Failed to fetch device %s: %s", device_id, e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(HUBITAT_MAX_WORKERS, len(device_ids))) as executor:
+        results = list(executor.map(fetch, device_ids))
+    devices = [d for d in results if d is not None]
+    if not devices:
+        raise RuntimeError(f"Failed to fetch any of {len(device_ids)} configured devices")
+    return devices
 
 
 def extract_trv_fields(device: Dict[str, Any]) -> Dict[str, Any]:
@@ -2,10 +2,17 @@ import os
 import time
 import sys
 import logging
-from typing import List
-
-from hubitat_client import fetch_devices, extract_trv_fields
-from db import insert_trv_rows, init_database
+from typing import List, Dict, Any, Optional
+
+from hubitat_client import iter_devices, extract_trv_fields, device_filter_from_env
+from db import (
+    insert_trv_rows,
+    init_database,
+    configure_compression,
+    compression_report,
+    configure_retention,
+    fetch_latest_trv_rows,
+)
 from migrations import run_migrations
 
 from flask import Flask, request, jsonify
@@ -17,21 +24,70 @@ logger = logging.getLogger("hubitat_agent")
 DEBUG_ENV = os.getenv('HUBITAT_DEBUG', '')
 DEBUG = (DEBUG_ENV.lower() in ('1', 'true', 'yes')) or ('--debug' in sys.argv)
 
+# Which devices to record (capabilities/types/IDs), compiled once at startup
+DEVICE_FILTER = device_filter_from_env()
+
+# In poll mode an unchanged device is re-written at most this often (0 writes every poll)
+TRV_HEARTBEAT_SECONDS = int(os.getenv("TRV_HEARTBEAT_SECONDS", "900"))
+
+# A poll row is written when any of these differ from the device's last written row
+CHANGE_FIELDS = ["temperature", "setpoint", "battery", "health_status", "operating_state"]
+
+
+class ChangeFilter:
+    """Drop poll rows identical to the last row written for the device.
+
+    Remembers the CHANGE_FIELDS values and write time per device_id; a row is
+    kept when any value changed or `heartbeat` seconds have passed, so stable
+    rooms still show up regularly.
+    """
+
+    def __init__(self, heartbeat: int):
+        self.heartbeat = heartbeat
+        self._last: Dict[str, Any] = {}
+
+    def seed(self, latest: Dict[str, Any]):
+        """Load ``{device_id: (time, {field: value})}`` rows already in the database."""
+        for device_id, (written_at, values) in latest.items():
+            self._last[device_id] = (tuple(values[f] for f in CHANGE_FIELDS), written_at.timestamp())
+
+    def changed(self, rows: List[Dict[str, Any]], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        if self.heartbeat <= 0:
+            return rows
+        now = time.time() if now is None else now
+        kept = []
+        for r in rows:
+            last = self._last.get(r["device_id"])
+            values = tuple(r.get(f) for f in CHANGE_FIELDS)
+            if last is None or last[0] != values or now - last[1] >= self.heartbeat:
+                kept.append(r)
+        return kept
+
+    def mark_written(self, rows: List[Dict[str, Any]], now: Optional[float] = None):
+        now = time.time() if now is None else now
+        for r in rows:
+            self._last[r["device_id"]] = (tuple(r.get(f) for f in CHANGE_FIELDS), now)
+
+
+CHANGE_FILTER = ChangeFilter(TRV_HEARTBEAT_SECONDS)
+
 
 def run_poll_once():
+    # Devices are extracted as they are parsed; filtered-out devices are dropped before extraction
+    rows = []
     try:
-        devices = fetch_devices()
+        for d in iter_devices(keep=DEVICE_FILTER):
+            r = extract_trv_fields(d)
+            if r.get("device_id") is None:
+                continue
+            rows.append(r)
     except Exception as e:
         logger.exception("Failed to fetch devices: %s", e)
         return
-    rows = []
-    for d in devices:
-        r = extract_trv_fields(d)
-        if r.get("device_id") is None:
-            continue
-        rows.append(r)
+    changed = CHANGE_FILTER.changed(rows)
     try:
-        insert_trv_rows(rows)
+        timing = insert_trv_rows(changed)
+        CHANGE_FILTER.mark_written(changed)
         # If not in debug mode, print a compact single-line summary instead of extra logs
         if not DEBUG:
             ts = time.strftime('%Y-%m-%d %H:%M:%S')
@@ -40,9 +96,15 @@ def run_poll_once():
                 dev = r.get('device_id') or '(no-id)'
                 temp = r.get('temperature')
                 parts.append(f"{dev}:{temp}")
-            logger.info("%s | %s", ts, ' '.join(parts))
+            logger.info(
+                "%s | %s | wrote %d/%d | %.1f ms",
+                ts, ' '.join(parts), len(changed), len(rows), timing["write_ms"],
+            )
         else:
-            logger.info("Inserted %d device rows", len(rows))
+            logger.info(
+                "Inserted %d of %d device rows (connect %.1f ms, write %.1f ms)",
+                len(changed), len(rows), timing["connect_ms"], timing["write_ms"],
+            )
     except Exception:
         logger.exception("Failed to write rows to DB")
 
@@ -79,16 +141,18 @@ def create_server_app():
 
         rows = []
         for d in devices:
+            if not isinstance(d, dict) or not DEVICE_FILTER(d):
+                continue
             r = extract_trv_fields(d)
             if r.get("device_id") is None:
                 continue
             rows.append(r)
         try:
-            insert_trv_rows(rows)
+            timing = insert_trv_rows(rows)
         except Exception:
             logger.exception("Error inserting rows from webhook")
             return "db error", 500
-        return jsonify({"inserted": len(rows)})
+        return jsonify({"inserted": len(rows), "write_ms": round(timing["write_ms"], 1)})
 
     return app
 
@@ -107,6 +171,23 @@ def main():
             logger.error("Failed to initialize database via fallback: %s", e2)
             raise
 
+    # Keep older chunks compressed; failure here shouldn't stop data collection
+    try:
+        if configure_compression(os.getenv("TRV_COMPRESS_AFTER", "7 days")):
+            logger.info("Compression: %s", compression_report())
+    except Exception as e:
+        logger.warning("Could not configure compression: %s", e)
+
+    # TRV_RETENTION is a PostgreSQL interval; unset or "forever" keeps every reading
+    retention = os.getenv("TRV_RETENTION", "forever").strip()
+    if retention.lower() in ("", "none", "forever"):
+        retention = None
+    try:
+        if configure_retention(retention):
+            logger.info("Retention: trv_temperatures kept %s", f"for {retention}" if retention else "forever")
+    except Exception as e:
+        logger.warning("Could not configure retention: %s", e)
+
     mode = os.getenv("MODE", "poll")
     interval = int(os.getenv("POLL_INTERVAL_SECONDS", "60"))
     run_once = os.getenv("RUN_ONCE", "false").lower() in ("1", "true", "yes")
@@ -121,7 +202,13 @@ def main():
         app.run(host=host, port=port)
         return
 
-    # default: poll mode
+    # default: poll mode. Seed change detection so a restart doesn't rewrite every device
+    if TRV_HEARTBEAT_SECONDS > 0:
+        try:
+            CHANGE_FILTER.seed(fetch_latest_trv_rows(CHANGE_FIELDS, TRV_HEARTBEAT_SECONDS))
+        except Exception as e:
+            logger.warning("Could not load last written rows; first poll writes every device: %s", e)
+
     if run_once:
         run_poll_once()
     else:
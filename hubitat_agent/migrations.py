@@ -1,17 +1,28 @@
-import os
+import sys
 import logging
-import psycopg2
 from pathlib import Path
 
+try:
+    from migrate import apply_migrations
+except ImportError:
+    # Running from a source checkout: the shared runner lives at the repo root
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from migrate import apply_migrations
+
+from db import pooled_conn
+
 logger = logging.getLogger("migrations")
 
+# Ledger name for the agent's migrations in schema_migrations
+COMPONENT = "hubitat_agent"
+
 
 def run_migrations():
-    """Run all SQL migrations from the migrations directory."""
-    dsn = os.getenv("TIMESCALEDB_URL") or os.getenv("DATABASE_URL")
-    if not dsn:
-        raise RuntimeError("TIMESCALEDB_URL or DATABASE_URL must be set to run migrations")
+    """Apply pending SQL migrations from the migrations directory.
 
+    Already-applied files are skipped using the shared schema_migrations
+    ledger, so a normal start-up is a single lookup.
+    """
     # Find migration files in the migrations directory alongside this script
     script_dir = Path(__file__).parent
     migrations_dir = script_dir / "migrations"
@@ -20,24 +31,13 @@ def run_migrations():
         logger.warning("Migrations directory does not exist: %s", migrations_dir)
         return
 
-    # Get sorted migration files
-    migration_files = sorted(migrations_dir.glob("*.sql"))
-    if not migration_files:
-        logger.info("No migration files found")
-        return
-
-    conn = psycopg2.connect(dsn)
     try:
-        with conn:
-            with conn.cursor() as cur:
-                for migration_file in migration_files:
-                    logger.info("Running migration: %s", migration_file.name)
-                    with open(migration_file, "r") as f:
-                        sql = f.read()
-                    cur.execute(sql)
-        logger.info("All migrations completed successfully")
+        with pooled_conn() as conn:
+            applied = apply_migrations(conn, migrations_dir, COMPONENT)
+        for name in applied:
+            logger.info("Applied migration: %s", name)
+        if not applied:
+            logger.info("Database schema is up to date")
     except Exception as e:
         logger.exception("Migration failed: %s", e)
         raise
-    finally:
-        conn.close()
@@ -0,0 +1,159 @@
+from contextlib import contextmanager
+
+import psycopg2
+
+import db
+
+
+class FakeCursor:
+    def __init__(self, statements=None):
+        self.statements = statements if statements is not None else []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+
+class FakeConn:
+    def __init__(self, closed=False):
+        self.closed = closed
+        self.statements = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return FakeCursor(self.statements)
+
+    def close(self):
+        self.closed = True
+
+    def rollback(self):
+        pass
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakePool:
+    def __init__(self, conns):
+        self.conns = list(conns)
+        self.returned = []
+
+    def getconn(self):
+        return self.conns.pop(0)
+
+    def putconn(self, conn, close=False):
+        self.returned.append((conn, close))
+
+
+def test_insert_trv_rows_single_statement(monkeypatch):
+    conn = FakeConn()
+    calls = []
+
+    @contextmanager
+    def fake_pooled_conn():
+        yield conn
+
+    monkeypatch.setattr(db, "pooled_conn", fake_pooled_conn)
+    monkeypatch.setattr(db, "execute_values", lambda cur, sql, values, **kw: calls.append((sql, values)))
+    monkeypatch.setattr(db, "_known_descriptors", set())
+
+    rows = [
+        {"device_id": "45", "temperature": 17.6, "raw": {"id": "45", "attributes": {"temperature": "17.6"}}},
+        {"device_id": "46", "temperature": 18.2, "raw": {"id": "46", "attributes": {"temperature": "18.2"}}},
+    ]
+    timing = db.insert_trv_rows(rows)
+
+    descriptors_sql, descriptors = calls[0]
+    readings_sql, readings = calls[1]
+    assert "trv_device_descriptors" in descriptors_sql
+    assert len(descriptors) == 2
+    assert [v[0] for v in readings] == ["45", "46"]
+    assert [v[-1] for v in readings] == [d[0] for d in descriptors]
+    assert timing["rows"] == 2
+    assert timing["write_ms"] >= 0
+
+    # Unchanged devices with new attribute values reuse the stored descriptors
+    calls.clear()
+    rows[0]["raw"]["attributes"]["temperature"] = "17.9"
+    db.insert_trv_rows(rows)
+    assert len(calls) == 1
+    assert "trv_temperatures" in calls[0][0]
+
+
+def test_insert_trv_rows_empty_skips_database(monkeypatch):
+    def fail():
+        raise AssertionError("should not connect for an empty batch")
+
+    monkeypatch.setattr(db, "pooled_conn", fail)
+
+    assert db.insert_trv_rows([])["rows"] == 0
+
+
+def test_pooled_conn_discards_broken_connection(monkeypatch):
+    dead, live = FakeConn(closed=True), FakeConn()
+    pool = FakePool([dead, live])
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+
+    with db.pooled_conn() as conn:
+        assert conn is live
+
+    assert pool.returned == [(dead, True), (live, False)]
+
+
+def test_pooled_conn_closes_connection_that_fails(monkeypatch):
+    live = FakeConn()
+    pool = FakePool([live])
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+
+    try:
+        with db.pooled_conn():
+            raise psycopg2.OperationalError("server closed the connection")
+    except psycopg2.OperationalError:
+        pass
+
+    assert pool.returned == [(live, True)]
+
+
+def test_descriptor_hash_ignores_volatile_fields():
+    device = {
+        "id": "45",
+        "name": "Sonoff TRVZB",
+        "type": "Sonoff Zigbee TRV",
+        "capabilities": ["ThermostatMode", "TemperatureMeasurement"],
+        "date": "2024-01-15T10:00:00+0000",
+        "attributes": {"temperature": "17.6"},
+    }
+    first = db.descriptor_hash(db.device_descriptor(device))
+
+    device["date"] = "2024-01-15T10:01:00+0000"
+    device["attributes"]["temperature"] = "17.9"
+    assert db.descriptor_hash(db.device_descriptor(device)) == first
+
+    device["label"] = "Renamed Room"
+    assert db.descriptor_hash(db.device_descriptor(device)) != first
+
+
+def test_init_database_adds_descriptor_hash_to_existing_table(monkeypatch):
+    conn = FakeConn()
+
+    @contextmanager
+    def fake_pooled_conn():
+        yield conn
+
+    monkeypatch.setattr(db, "pooled_conn", fake_pooled_conn)
+    db.init_database()
+
+    assert any(
+        "ALTER TABLE trv_temperatures ADD COLUMN IF NOT EXISTS descriptor_hash" in sql
+        for sql in conn.statements
+    )
@@ -1,5 +1,17 @@
+import io
+import json
+from types import SimpleNamespace
+
 import pytest
-from hubitat_client import extract_trv_fields
+import hubitat_client
+from hubitat_client import (
+    build_device_url,
+    compile_device_filter,
+    extract_trv_fields,
+    is_thermostat,
+    iter_devices,
+    normalise_device,
+)
 
 
 @pytest.fixture
@@ -118,3 +130,108 @@ def test_extract_trv_fields_none_attributes(sample_trv_device):
     assert result["temperature"] is None
     assert result["setpoint"] is None
     assert result["battery"] is None
+
+
+def test_build_device_url(monkeypatch):
+    """Per-device URLs keep the access token from the /devices/all URL."""
+    monkeypatch.setenv("HUBITAT_API_URL", "http://hub/apps/api/50/devices/all?access_token=abc")
+
+    assert build_device_url("45") == "http://hub/apps/api/50/devices/45?access_token=abc"
+
+
+def test_normalise_device_attribute_list(sample_trv_device):
+    """Per-device responses list attributes; they are converted to the /devices/all dict shape."""
+    sample_trv_device["attributes"] = [
+        {"name": "temperature", "currentValue": 17.6, "dataType": "NUMBER"},
+        {"name": "battery", "currentValue": 100, "dataType": "NUMBER"},
+    ]
+    result = extract_trv_fields(normalise_device(sample_trv_device))
+
+    assert result["temperature"] == 17.6
+    assert result["battery"] == 100
+
+
+def test_is_thermostat_by_capability(sample_trv_device):
+    """Devices are kept for thermostat/temperature capabilities; unknown capabilities are kept too."""
+    sample_trv_device["capabilities"] = ["Switch", {"attributes": [{"name": "switch"}]}]
+    assert not is_thermostat(sample_trv_device)
+
+    sample_trv_device["capabilities"].append("TemperatureMeasurement")
+    assert is_thermostat(sample_trv_device)
+
+    del sample_trv_device["capabilities"]
+    assert is_thermostat(sample_trv_device)
+
+
+def test_compile_device_filter_types_and_ids(sample_trv_device):
+    """Type patterns match case-insensitively; the ID allow-list applies on top."""
+    sample_trv_device["capabilities"] = ["Switch"]
+    by_type = compile_device_filter(capabilities=["TemperatureMeasurement"], types=["zigbee trv"])
+    assert by_type(sample_trv_device)
+
+    only_other_ids = compile_device_filter(types=["zigbee trv"], ids=["46"])
+    assert not only_other_ids(sample_trv_device)
+
+    assert compile_device_filter()(sample_trv_device)
+
+
+class FakeStreamResponse:
+    """Streamed /devices/all response backed by a JSON byte string."""
+
+    def __init__(self, body):
+        self.raw = io.BytesIO(body.encode())
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def streamed_response(monkeypatch):
+    """Serve the next iter_devices() call from a JSON body through the ijson path."""
+    monkeypatch.setenv("HUBITAT_API_URL", "http://hub/apps/api/50/devices/all?access_token=abc")
+
+    def serve(body):
+        resp = FakeStreamResponse(body)
+        session = SimpleNamespace(get=lambda *args, **kwargs: resp)
+        monkeypatch.setattr(hubitat_client, "get_session", lambda: session)
+        return resp
+
+    return serve
+
+
+def test_iter_devices_streams_and_filters(streamed_response):
+    """Devices are parsed incrementally and `keep` drops rejected ones."""
+    resp = streamed_response(json.dumps([
+        {"id": "45", "type": "Sonoff Zigbee TRV", "attributes": {"temperature": 17.6}},
+        {"id": "46", "type": "Generic Switch", "attributes": {}},
+    ]))
+
+    devices = list(iter_devices(device_ids=[], keep=lambda d: "TRV" in d["type"]))
+
+    assert [d["id"] for d in devices] == ["45"]
+    assert devices[0]["attributes"]["temperature"] == 17.6
+    assert resp.closed
+
+
+def test_iter_devices_rejects_non_list(streamed_response):
+    """A JSON object at the top level raises instead of yielding nothing."""
+    resp = streamed_response(json.dumps({"error": "unauthorised"}))
+
+    with pytest.raises(RuntimeError, match="expected a list"):
+        list(iter_devices(device_ids=[]))
+    assert resp.closed
+
+
+def test_iter_devices_closes_response_on_early_exit(streamed_response):
+    """Stopping after the first device still hands the connection back."""
+    resp = streamed_response(json.dumps([{"id": "45"}, {"id": "46"}]))
+
+    devices = iter_devices(device_ids=[])
+    assert next(devices)["id"] == "45"
+    devices.close()
+
+    assert resp.closed
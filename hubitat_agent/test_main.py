@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+from main import ChangeFilter
+
+
+def row(device_id, temperature, setpoint=19.0):
+    return {"device_id": device_id, "temperature": temperature, "setpoint": setpoint,
+            "battery": 100, "health_status": "online", "operating_state": "idle"}
+
+
+def test_change_filter_drops_unchanged_until_heartbeat():
+    change_filter = ChangeFilter(heartbeat=900)
+    change_filter.mark_written([row("45", 17.6), row("46", 18.0)], now=1000)
+
+    changed = change_filter.changed([row("45", 17.6), row("46", 18.5)], now=1060)
+    assert [r["device_id"] for r in changed] == ["46"]
+
+    changed = change_filter.changed([row("45", 17.6)], now=1900)
+    assert [r["device_id"] for r in changed] == ["45"]
+
+
+def test_change_filter_seeded_from_database():
+    change_filter = ChangeFilter(heartbeat=900)
+    written_at = datetime.fromtimestamp(1000, tz=timezone.utc)
+    values = {k: v for k, v in row("45", 17.6).items() if k != "device_id"}
+    change_filter.seed({"45": (written_at, values)})
+
+    assert change_filter.changed([row("45", 17.6)], now=1060) == []
+    assert change_filter.changed([row("47", 20.0)], now=1060) == [row("47", 20.0)]
+
+
+def test_change_filter_disabled_with_zero_heartbeat():
+    change_filter = ChangeFilter(heartbeat=0)
+    change_filter.mark_written([row("45", 17.6)], now=1000)
+
+    assert change_filter.changed([row("45", 17.6)], now=1001) == [row("45", 17.6)]
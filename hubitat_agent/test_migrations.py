@@ -0,0 +1,35 @@
+import pytest
+
+import migrations  # noqa: F401 - puts the shared runner at the repo root on sys.path
+from migrate import MigrationError, discover_migrations, pending_migrations
+
+
+def test_discover_migrations_sorted_with_checksums(tmp_path):
+    (tmp_path / "002_b.sql").write_text("SELECT 2;")
+    (tmp_path / "001_a.sql").write_text("SELECT 1;")
+    (tmp_path / "notes.txt").write_text("ignored")
+
+    found = discover_migrations(tmp_path)
+
+    assert [name for name, _, _ in found] == ["001_a.sql", "002_b.sql"]
+    assert found[0][1] == "SELECT 1;"
+    assert len(found[0][2]) == 64
+
+
+def test_pending_migrations_skips_applied(tmp_path):
+    (tmp_path / "001_a.sql").write_text("SELECT 1;")
+    (tmp_path / "002_b.sql").write_text("SELECT 2;")
+    found = discover_migrations(tmp_path)
+    applied = {"001_a.sql": found[0][2]}
+
+    pending = pending_migrations(found, applied)
+
+    assert [name for name, _, _ in pending] == ["002_b.sql"]
+
+
+def test_pending_migrations_rejects_edited_file(tmp_path):
+    (tmp_path / "001_a.sql").write_text("SELECT 1;")
+    found = discover_migrations(tmp_path)
+
+    with pytest.raises(MigrationError):
+        pending_migrations(found, {"001_a.sql": "0" * 64})
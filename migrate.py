@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+migrate.py
+
+Versioned SQL migration runner shared by temp_monitor and the Hubitat agent.
+
+Each `*.sql` file in a migrations directory is applied once, in file name
+order, in its own transaction. Applied files are recorded with a SHA-256
+checksum in the `schema_migrations` table under a component name, so the
+services sharing a database keep separate histories. A PostgreSQL advisory
+lock serialises concurrent runners, and when nothing is pending a start-up
+costs a single ledger lookup.
+
+Usage:
+  # Apply pending migrations
+  DATABASE_URL=postgresql://... python3 migrate.py migrations/temp_monitor --component temp_monitor
+
+  # Show what has been applied and what is pending
+  DATABASE_URL=postgresql://... python3 migrate.py migrations --component hubitat_agent --status
+
+Environment:
+  DATABASE_URL (or TIMESCALEDB_URL): PostgreSQL connection string (required)
+"""
+
+import os
+import sys
+import argparse
+import hashlib
+from pathlib import Path
+
+import psycopg2
+
+
+# Arbitrary application-wide key for pg_advisory_lock
+MIGRATION_LOCK_KEY = 7305320001
+
+LEDGER_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        component TEXT NOT NULL,
+        name TEXT NOT NULL,
+        checksum TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (component, name)
+    );
+"""
+
+
+class MigrationError(RuntimeError):
+    """An applied migration file no longer matches the ledger."""
+
+
+def discover_migrations(directory):
+    """Return [(name, sql, checksum)] for every *.sql file in `directory`, in name order."""
+    migrations = []
+    for path in sorted(Path(directory).glob("*.sql")):
+        data = path.read_bytes()
+        migrations.append((path.name, data.decode("utf-8"), hashlib.sha256(data).hexdigest()))
+    return migrations
+
+
+def applied_migrations(cursor, component):
+    """Return {name: checksum} of the migrations applied for `component`."""
+    cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return {}
+    cursor.execute("SELECT name, checksum FROM schema_migrations WHERE component = %s", (component,))
+    return dict(cursor.fetchall())
+
+
+def pending_migrations(migrations, applied):
+    """Filter `migrations` down to those not yet applied.
+
+    Raises MigrationError if an applied file has been edited since.
+    """
+    pending = []
+    for name, sql, checksum in migrations:
+        if name not in applied:
+            pending.append((name, sql, checksum))
+        elif applied[name] != checksum:
+            raise MigrationError(
+                f"Migration {name} has changed since it was applied; "
+                f"add a new migration instead of editing it"
+            )
+    return pending
+
+
+def apply_migrations(conn, directory, component):
+    """Apply the pending migrations in `directory` for `component`.
+
+    Returns the names of the migrations applied (empty when up to date).
+    The connection must not be in autocommit mode.
+    """
+    migrations = discover_migrations(directory)
+    if not migrations:
+        return []
+
+    # Fast path: everything already applied, no lock needed
+    with conn:
+        with conn.cursor() as cur:
+            if not pending_migrations(migrations, applied_migrations(cur, component)):
+                return []
+
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(LEDGER_DDL)
+        # Another service may have applied some while we waited for the lock
+        with conn:
+            with conn.cursor() as cur:
+                pending = pending_migrations(migrations, applied_migrations(cur, component))
+
+        applied = []
+        for name, sql, checksum in pending:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (component, name, checksum) VALUES (%s, %s, %s)",
+                        (component, name, checksum),
+                    )
+            applied.append(name)
+        return applied
+    finally:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+
+
+def print_status(conn, directory, component):
+    with conn:
+        with conn.cursor() as cur:
+            applied = applied_migrations(cur, component)
+    for name, _, checksum in discover_migrations(directory):
+        if name not in applied:
+            state = "pending"
+        elif applied[name] != checksum:
+            state = "CHANGED"
+        else:
+            state = "applied"
+        print(f"  {state:8s} {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned SQL migrations")
+    parser.add_argument("directory", help="Directory containing *.sql migration files")
+    parser.add_argument("--component", required=True, help="Ledger name for this set of migrations")
+    parser.add_argument("--status", action="store_true", help="Show applied/pending migrations and exit")
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL") or os.getenv("TIMESCALEDB_URL")
+    if not database_url:
+        print("ERROR: DATABASE_URL environment variable not set")
+        sys.exit(1)
+
+    conn = psycopg2.connect(database_url)
+    try:
+        if args.status:
+            print_status(conn, args.directory, args.component)
+            return
+        applied = apply_migrations(conn, args.directory, args.component)
+        for name in applied:
+            print(f"Applied {name}")
+        if not applied:
+            print("Database is up to date")
+    except Exception as e:
+        print(f"ERROR: Migration failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
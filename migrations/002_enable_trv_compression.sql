@@ -0,0 +1,21 @@
+-- Enable TimescaleDB native compression on trv_temperatures.
+-- Segmenting by device keeps each TRV's readings together so they compress
+-- well; ordering by time DESC matches the typical "latest first" queries.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM timescaledb_information.hypertables
+        WHERE hypertable_name = 'trv_temperatures' AND NOT compression_enabled
+    ) THEN
+        ALTER TABLE trv_temperatures SET (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = 'device_id',
+            timescaledb.compress_orderby = 'time DESC'
+        );
+    END IF;
+END
+$$;
+
+-- Compress chunks older than 7 days. The agent adjusts this to
+-- TRV_COMPRESS_AFTER on startup.
+SELECT add_compression_policy('trv_temperatures', INTERVAL '7 days', if_not_exists => TRUE);
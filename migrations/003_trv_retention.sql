@@ -0,0 +1,4 @@
+-- Drop trv_temperatures chunks older than a year. TRV readings arrive once
+-- per poll per device, so a year of history stays small; the agent adjusts
+-- this to TRV_RETENTION (or removes it for "forever") on startup.
+SELECT add_retention_policy('trv_temperatures', INTERVAL '365 days', if_not_exists => TRUE);
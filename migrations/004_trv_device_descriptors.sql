@@ -0,0 +1,13 @@
+-- Content-addressed device descriptors. The Maker API device object
+-- (name, type, capabilities, commands, ...) almost never changes, so it is
+-- stored once per distinct content and each reading references it by an
+-- 8-byte hash instead of repeating the whole object as JSONB.
+CREATE TABLE IF NOT EXISTS trv_device_descriptors (
+    hash BIGINT PRIMARY KEY,
+    device_id TEXT,
+    descriptor JSONB NOT NULL,
+    first_seen TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- New readings set descriptor_hash and leave raw NULL; older rows keep raw
+ALTER TABLE trv_temperatures ADD COLUMN IF NOT EXISTS descriptor_hash BIGINT;
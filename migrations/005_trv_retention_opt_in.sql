@@ -0,0 +1,5 @@
+-- TRV readings have no downsampled tier to fall back on, so dropping old
+-- chunks loses that history for good. Retention is opt-in: remove the
+-- default policy from 003; the agent installs one only when TRV_RETENTION
+-- is set.
+SELECT remove_retention_policy('trv_temperatures', if_exists => TRUE);
@@ -0,0 +1,55 @@
+-- Readings are stored compactly as the signed 16-bit register value plus the
+-- calibration offset applied at ingest (both in 0.1°C units).
+CREATE TABLE IF NOT EXISTS sensor_readings_raw (
+    time TIMESTAMPTZ NOT NULL,
+    sensor_id INTEGER NOT NULL,
+    raw_value SMALLINT NOT NULL,
+    offset_raw SMALLINT NOT NULL DEFAULT 0
+);
+
+-- Make hypertable (TimescaleDB); plain PostgreSQL keeps a regular table
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb') THEN
+        PERFORM create_hypertable('sensor_readings_raw', 'time', if_not_exists => TRUE);
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS sensor_readings_raw_sensor_id_time
+ON sensor_readings_raw (sensor_id, time DESC);
+
+-- Migrate a legacy sensor_readings table (°C/°F stored as doubles)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = 'sensor_readings' AND n.nspname = current_schema()
+          AND c.relkind IN ('r', 'p')
+    ) THEN
+        INSERT INTO sensor_readings_raw (time, sensor_id, raw_value, offset_raw)
+        SELECT time, sensor_id, signed_raw, round(temperature_celsius * 10)::integer - signed_raw
+        FROM (
+            SELECT time, sensor_id, temperature_celsius,
+                   COALESCE(
+                       CASE WHEN raw_value > 32767 THEN raw_value - 65536 ELSE raw_value END,
+                       round(temperature_celsius * 10)::integer
+                   ) AS signed_raw
+            FROM sensor_readings
+        ) legacy;
+        DROP TABLE sensor_readings;
+    END IF;
+END
+$$;
+
+-- Temperatures are derived at query time from raw + offset, so existing
+-- queries against sensor_readings keep working
+CREATE OR REPLACE VIEW sensor_readings AS
+SELECT time,
+       sensor_id,
+       ((raw_value + offset_raw::integer) / 10.0)::double precision AS temperature_celsius,
+       ((raw_value + offset_raw::integer) * 0.18 + 32)::double precision AS temperature_fahrenheit,
+       raw_value,
+       offset_raw
+FROM sensor_readings_raw;
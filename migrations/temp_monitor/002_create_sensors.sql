@@ -0,0 +1,25 @@
+-- Durable sensor identities and calibration. temp_monitor inserts a row per
+-- port on startup (id == port_number by default).
+CREATE TABLE IF NOT EXISTS sensors (
+    id INTEGER PRIMARY KEY,
+    port_number INTEGER NOT NULL,
+    rom_code TEXT UNIQUE,
+    calibration_offset_raw INTEGER DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS sensors_port_number_idx ON sensors (port_number);
+
+-- Notify listeners (temp_monitor's SensorRegistry) whenever the table changes,
+-- e.g. when calibrate.py applies new offsets. The channel must match
+-- SENSORS_CHANNEL in temp_monitor.py.
+CREATE OR REPLACE FUNCTION notify_sensors_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('sensors_changed', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sensors_changed_notify ON sensors;
+CREATE TRIGGER sensors_changed_notify
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON sensors
+FOR EACH STATEMENT EXECUTE FUNCTION notify_sensors_changed();
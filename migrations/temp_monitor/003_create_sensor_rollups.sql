@@ -0,0 +1,45 @@
+-- Minute/hour/day continuous aggregates of sensor_readings_raw with refresh
+-- policies. Each rollup is built from the raw hypertable (not stacked) so the
+-- averages stay exact; real-time aggregation answers the newest buckets from
+-- raw data until they are materialized. avg_raw is the uncalibrated mean used
+-- by calibrate.py. Skipped on plain PostgreSQL.
+DO $$
+DECLARE
+    rollup RECORD;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb') THEN
+        RAISE NOTICE 'TimescaleDB not installed; skipping sensor reading rollups';
+        RETURN;
+    END IF;
+
+    FOR rollup IN
+        SELECT * FROM (VALUES
+            ('sensor_readings_1m', INTERVAL '1 minute', INTERVAL '1 hour', INTERVAL '1 minute', INTERVAL '1 minute'),
+            ('sensor_readings_1h', INTERVAL '1 hour', INTERVAL '3 hours', INTERVAL '1 hour', INTERVAL '30 minutes'),
+            ('sensor_readings_1d', INTERVAL '1 day', INTERVAL '3 days', INTERVAL '1 day', INTERVAL '1 hour')
+        ) AS r (view_name, bucket, start_offset, end_offset, schedule)
+    LOOP
+        EXECUTE format($view$
+            CREATE MATERIALIZED VIEW IF NOT EXISTS %I
+            WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+            SELECT time_bucket(%L::interval, time) AS bucket,
+                   sensor_id,
+                   (avg(raw_value + offset_raw::integer) / 10.0)::double precision AS avg_celsius,
+                   (min(raw_value + offset_raw::integer) / 10.0)::double precision AS min_celsius,
+                   (max(raw_value + offset_raw::integer) / 10.0)::double precision AS max_celsius,
+                   (last(raw_value + offset_raw::integer, time) / 10.0)::double precision AS last_celsius,
+                   avg(raw_value)::double precision AS avg_raw,
+                   count(*) AS reading_count
+            FROM sensor_readings_raw
+            GROUP BY bucket, sensor_id
+            WITH NO DATA
+        $view$, rollup.view_name, rollup.bucket);
+
+        PERFORM add_continuous_aggregate_policy(rollup.view_name::regclass,
+            start_offset => rollup.start_offset,
+            end_offset => rollup.end_offset,
+            schedule_interval => rollup.schedule,
+            if_not_exists => TRUE);
+    END LOOP;
+END
+$$;
@@ -0,0 +1,319 @@
+import threading
+from datetime import datetime, timedelta
+
+import psycopg2
+import psycopg2.errors
+import pytest
+
+import temp_monitor as tm
+
+
+def test_async_polling_engine_builds_clients_and_channel_bases():
+    engine = tm.AsyncPollingEngine([('/dev/null', [1, 2]), ('/dev/ttyX', [3])], 8)
+
+    assert [(port, bases) for port, _, bases in engine.buses] == [
+        ('/dev/null', [(1, 0), (2, 8)]),
+        ('/dev/ttyX', [(3, 16)]),
+    ]
+    assert all(isinstance(client, tm.AsyncModbusSerialClient) for _, client, _ in engine.buses)
+    assert engine._executor is None
+
+
+ROW_TIME = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def reading(seconds, sensor_id=1, raw=215, offset=0):
+    return (ROW_TIME + timedelta(seconds=seconds), sensor_id, raw, offset)
+
+
+class FakeCopyCursor:
+    def __init__(self):
+        self.rowcount = 0
+        self.calls = []
+
+    def execute(self, sql, params=None):
+        self.calls.append((sql, params))
+
+    def fetchone(self):
+        return (True,)
+
+    def copy_expert(self, sql, f):
+        lines = f.read().splitlines()
+        if any(len(line.split(',')) != 4 for line in lines):
+            raise psycopg2.DataError("missing data for column")
+        if any(line.endswith(',') for line in lines):
+            raise psycopg2.errors.NotNullViolation("null value in column \"offset_raw\"")
+        self.rowcount = len(lines)
+
+
+class FakeDb:
+    def __init__(self, error=None):
+        self.error = error
+        self.copied = 0
+        self.refreshed = []
+
+    def run(self, work, autocommit=False):
+        if self.error is not None:
+            raise self.error
+        cursor = FakeCopyCursor()
+        result = work(cursor)
+        self.copied += cursor.rowcount
+        if autocommit:
+            self.refreshed += [params for sql, params in cursor.calls if sql.startswith('CALL')]
+        return result
+
+
+class FakeClock:
+    def __init__(self, mono, wall):
+        self.mono = mono
+        self.wall = wall
+
+    def advance(self, seconds):
+        self.mono += seconds
+        self.wall += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock(100.0, 1002.0)
+    monkeypatch.setattr(tm.time, 'monotonic', lambda: fake.mono)
+    monkeypatch.setattr(tm.time, 'time', lambda: fake.wall)
+    return fake
+
+
+def make_spool(tmp_path, **kwargs):
+    options = dict(max_bytes=1 << 20, segment_bytes=1 << 20, fsync_rows=1)
+    options.update(kwargs)
+    return tm.ReadingSpool(str(tmp_path), **options)
+
+
+def test_spool_rotates_segments_at_size(tmp_path):
+    row_bytes = len(f"{reading(0)[0].isoformat()},1,215,0\n")
+    spool = make_spool(tmp_path, segment_bytes=2 * row_bytes)
+    for i in range(5):
+        spool.append([reading(i)])
+    spool.close()
+
+    segments = sorted(tmp_path.iterdir())
+    assert [len(p.read_text().splitlines()) for p in segments] == [2, 2, 1]
+    assert spool.stats['spooled_rows'] == 5
+
+
+def test_spool_discards_oldest_segments_over_cap(tmp_path):
+    row_bytes = len(f"{reading(0)[0].isoformat()},1,215,0\n")
+    spool = make_spool(tmp_path, segment_bytes=1, max_bytes=2 * row_bytes)
+    for i in range(5):
+        spool.append([reading(i, raw=200 + i)])
+
+    segments = sorted(tmp_path.iterdir())
+    assert spool.stats['discarded_segments'] == 3
+    assert [p.read_text().split(',')[2] for p in segments] == ['203', '204']
+
+
+def test_spool_drain_moves_unreadable_segments_aside(tmp_path, monkeypatch):
+    fake_db = FakeDb()
+    monkeypatch.setattr(tm, 'db', fake_db)
+    (tmp_path / '00000000000000000001.csv').write_text('2026-01-01T12:00:00,1,21')
+    spool = make_spool(tmp_path)
+    spool.append([reading(0), reading(1)])
+
+    assert spool.drain() == 2
+    assert [p.name for p in tmp_path.iterdir()] == ['00000000000000000001.csv.bad']
+    assert spool.stats['bad_segments'] == 1
+    assert not spool.pending()
+
+
+def test_spool_drain_backs_off_after_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(tm, 'db', FakeDb(psycopg2.OperationalError("down")))
+    spool = make_spool(tmp_path)
+    spool.append([reading(0)])
+
+    with pytest.raises(psycopg2.OperationalError):
+        spool.drain()
+    monkeypatch.setattr(tm, 'db', FakeDb())
+    assert spool.drain() == 0
+    assert spool.pending()
+
+
+def test_write_queue_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        tm.WriteQueue(1, policy='drop-newest')
+
+
+def test_write_queue_drop_oldest_keeps_latest_cycle():
+    write_queue = tm.WriteQueue(1, policy='drop-oldest')
+    write_queue.put([reading(0), reading(0, sensor_id=2)])
+    write_queue.put([reading(15)])
+
+    assert write_queue.stats['dropped'] == 2
+    assert write_queue._queue.get_nowait() == [reading(15)]
+
+
+def test_write_queue_block_waits_for_writer():
+    write_queue = tm.WriteQueue(1, policy='block')
+    write_queue.put([reading(0)])
+    producer = threading.Thread(target=write_queue.put, args=([reading(15)],), daemon=True)
+    producer.start()
+    producer.join(0.1)
+    assert producer.is_alive()
+
+    write_queue._queue.get_nowait()
+    producer.join(1)
+    assert not producer.is_alive()
+    assert write_queue.stats['dropped'] == 0
+    assert write_queue.stats['blocked_seconds'] > 0
+
+
+def test_write_queue_spill_appends_to_spool(tmp_path):
+    spool = make_spool(tmp_path)
+    write_queue = tm.WriteQueue(1, policy='spill', spool=spool)
+    write_queue.put([reading(0)])
+    write_queue.put([reading(15), reading(15, sensor_id=2)])
+
+    assert write_queue.stats['spilled'] == 2
+    assert spool.stats['spooled_rows'] == 2
+    assert write_queue._queue.qsize() == 1
+
+
+def test_scheduler_skips_ticks_after_overrun(clock):
+    scheduler = tm.FixedRateScheduler(5, align=False)
+    assert scheduler._advance() == 0
+
+    clock.advance(12)
+    assert scheduler._advance() == pytest.approx(3)
+    assert scheduler.overruns == 1
+    clock.advance(3)
+    assert scheduler._stamp() == datetime.fromtimestamp(1017.0)
+
+
+def test_scheduler_set_interval_aligns_to_new_boundary(clock):
+    scheduler = tm.FixedRateScheduler(5)
+    assert scheduler._advance() == pytest.approx(3)
+    clock.advance(3)
+    assert scheduler._stamp() == datetime.fromtimestamp(1005.0)
+
+    scheduler.set_interval(10)
+    assert scheduler._advance() == pytest.approx(5)
+    clock.advance(5)
+    assert scheduler._stamp() == datetime.fromtimestamp(1010.0)
+    assert scheduler.overruns == 0
+
+
+def test_deadband_suppresses_small_changes():
+    deadband = tm.DeadbandFilter(2, overrides={2: 0})
+    kept = deadband.filter([reading(0), reading(0, sensor_id=2)])
+    kept += deadband.filter([reading(15, raw=217), reading(15, sensor_id=2, raw=216)])
+    kept += deadband.filter([reading(30, raw=218), reading(30, sensor_id=2, raw=216)])
+
+    assert kept == [reading(0), reading(0, sensor_id=2),
+                    reading(15, sensor_id=2, raw=216), reading(30, raw=218)]
+    assert (deadband.kept, deadband.suppressed) == (4, 2)
+
+
+def test_deadband_compares_calibrated_values():
+    deadband = tm.DeadbandFilter(2)
+    deadband.filter([reading(0)])
+
+    assert deadband.filter([reading(15, raw=214, offset=4)]) == [reading(15, raw=214, offset=4)]
+
+
+def test_deadband_heartbeat_keeps_unchanged_sensor():
+    deadband = tm.DeadbandFilter(2, heartbeat=300)
+    deadband.filter([reading(0)])
+
+    assert deadband.filter([reading(299)]) == []
+    assert deadband.filter([reading(300)]) == [reading(300)]
+
+
+def test_calibrate_samples_applies_offsets():
+    temperatures = tm.decode_temperature_registers([215, 65526, 0], 2)
+    tm.calibrate_samples(temperatures, {1: (7, -5)}, ROW_TIME)
+
+    assert sorted(temperatures) == [1, 2]
+    assert (temperatures[1].sensor_id, temperatures[1].celsius, temperatures[1].true_celsius) == (7, 21.5, 21.0)
+    assert (temperatures[2].sensor_id, temperatures[2].true_celsius) == (2, -1.0)
+    assert tm.build_reading_rows(temperatures) == [(ROW_TIME, 7, 215, -5), (ROW_TIME, 2, -10, 0)]
+
+
+def test_parse_buses():
+    assert tm.parse_buses('/dev/ttyACM0:1,2; /dev/ttyUSB0:3') == [('/dev/ttyACM0', [1, 2]), ('/dev/ttyUSB0', [3])]
+    assert tm.parse_buses('') == [(tm.SERIAL_PORT, [tm.MODBUS_ADDRESS])]
+
+
+@pytest.mark.parametrize('spec', ['/dev/ttyACM0', '/dev/ttyACM0:', '/dev/ttyACM0: , ;/dev/ttyUSB0:2', ':1'])
+def test_parse_buses_rejects_entries_without_port_or_units(spec):
+    with pytest.raises(ValueError):
+        tm.parse_buses(spec)
+
+
+def test_spool_drain_refreshes_rollups_over_replayed_range(tmp_path, monkeypatch):
+    fake_db = FakeDb()
+    monkeypatch.setattr(tm, 'db', fake_db)
+    spool = make_spool(tmp_path, segment_bytes=1)
+    spool.append([reading(3600)])
+    spool.append([reading(0), reading(60, sensor_id=2)])
+
+    assert spool.drain() == 3
+    minute = timedelta(minutes=1)
+    assert fake_db.refreshed[0] == ('sensor_readings_1m', reading(0)[0] - minute, reading(3600)[0] + minute, minute)
+    assert [params[0] for params in fake_db.refreshed] == [view for view, _ in tm.ROLLUPS]
+
+
+def test_write_queue_close_skips_flush_while_writer_busy(monkeypatch):
+    flushed = []
+    monkeypatch.setattr(tm.writer, 'flush', lambda: flushed.append(True) or 0)
+    release = threading.Event()
+    write_queue = tm.WriteQueue(2)
+    monkeypatch.setattr(write_queue, '_write', lambda rows: release.wait(5))
+    write_queue.start()
+    write_queue.put([reading(0)])
+
+    write_queue.close(timeout=0.2)
+    assert flushed == []
+
+    release.set()
+    write_queue._thread.join(5)
+    write_queue.close(timeout=1)
+    assert flushed == [True]
+
+
+def test_spool_drain_moves_aside_segments_with_missing_values(tmp_path, monkeypatch):
+    monkeypatch.setattr(tm, 'db', FakeDb())
+    (tmp_path / '00000000000000000001.csv').write_text('2026-01-01T12:00:00,1,215,\n')
+    spool = make_spool(tmp_path)
+    spool.append([reading(0)])
+
+    assert spool.drain() == 1
+    assert [p.name for p in tmp_path.iterdir()] == ['00000000000000000001.csv.bad']
+
+
+def test_spool_append_does_not_wait_for_replay(tmp_path, monkeypatch):
+    copying = threading.Event()
+    release = threading.Event()
+
+    class SlowDb(FakeDb):
+        def run(self, work, autocommit=False):
+            if not autocommit:
+                copying.set()
+                release.wait(5)
+            return super().run(work, autocommit)
+
+    monkeypatch.setattr(tm, 'db', SlowDb())
+    row_bytes = len(f"{reading(0)[0].isoformat()},1,215,0\n")
+    spool = make_spool(tmp_path, segment_bytes=1, max_bytes=row_bytes)
+    spool.append([reading(0)])
+    drainer = threading.Thread(target=spool.drain, daemon=True)
+    drainer.start()
+    try:
+        assert copying.wait(5)
+        appender = threading.Thread(target=spool.append, args=([reading(15)],), daemon=True)
+        appender.start()
+        appender.join(1)
+        assert not appender.is_alive()
+        assert spool.stats['spooled_rows'] == 2
+        assert spool.stats['discarded_segments'] == 0
+    finally:
+        release.set()
+        drainer.join(5)
+    assert spool.stats['replayed_rows'] == 1
+    assert spool.pending()